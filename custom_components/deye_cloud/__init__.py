@@ -1,73 +1,199 @@
-from .const import DOMAIN
+from .const import DOMAIN, DEFAULT_SCAN_INTERVAL, MIN_REPLAY_SCAN_INTERVAL, CONF_RECORD_TRAFFIC, CONF_REPLAY_FILE, CONF_REPLAY_SPEED, CONF_EXPORT_SAMPLES
 
-PLATFORMS = ["sensor", "number", "switch", "select"]
+PLATFORMS = ["sensor"]
 
 import logging
+import time
+import voluptuous as vol
 _LOGGER = logging.getLogger(__name__)
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.exceptions import HomeAssistantError
 
 from .deye_api import DeyeCloudAPI
+from .traffic import TrafficRecorder, ReplaySession, load_recording
+from .alarms import DeyeAlarmMonitor
+from .tou import DeyeTouManager
+from .capabilities import (
+    CAPABILITY_TOU,
+    TOU_PLATFORMS,
+    async_detect_capabilities,
+    cache_record,
+    cached_capabilities,
+)
+from .coordinator import DeyeCoordinator
+from .profiling import async_start_profile
+from .samples import DeyeSampleSink
+from .fleet import (
+    account_key,
+    find_station,
+    async_get_fleet,
+    async_drop_fleet_if_empty,
+    cached_station,
+    station_record,
+)
 from homeassistant.helpers.storage import Store
-from datetime import timedelta
 
 async def async_get_options_flow(config_entry: ConfigEntry):
     from .config_flow import DeyeCloudOptionsFlow
     return DeyeCloudOptionsFlow(config_entry)
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    session = None
+    scan_interval = DEFAULT_SCAN_INTERVAL
+    replay_file = entry.options.get(CONF_REPLAY_FILE)
+    if replay_file:
+        # Answer API calls from a previous recording instead of the cloud
+        try:
+            exchanges = await hass.async_add_executor_job(load_recording, hass.config.path(replay_file))
+        except (OSError, ValueError) as e:
+            _LOGGER.error("Unable to load API recording %s: %s", replay_file, e)
+            return False
+        speed = entry.options.get(CONF_REPLAY_SPEED, 1.0)
+        session = ReplaySession(exchanges, speed=speed)
+        # Poll faster too, so an accelerated replay moves through the recording faster
+        scan_interval = MIN_REPLAY_SCAN_INTERVAL if speed <= 0 else max(DEFAULT_SCAN_INTERVAL / speed, MIN_REPLAY_SCAN_INTERVAL)
+        _LOGGER.warning("Replaying %d recorded API exchanges from %s", len(exchanges), replay_file)
+
+    recorder = None
+    if entry.options.get(CONF_RECORD_TRAFFIC) and not replay_file:
+        recorder = TrafficRecorder(hass.config.path(f"{DOMAIN}_{entry.entry_id}_traffic.jsonl"))
+        _LOGGER.info("Recording API traffic to %s", recorder.path)
+
+    store = Store(hass, 1, f"{DOMAIN}_{entry.entry_id}.json")
+    stored = await store.async_load() or {}
+
+    def persist_token(token, expiry):
+        stored["token"] = {"credentials": api.credentials_key, "access_token": token, "expiry": expiry}
+        store.async_delay_save(lambda: stored, 1)
+
     api = DeyeCloudAPI(
         base_url=entry.data["base_url"],
         app_id=entry.data["app_id"],
         app_secret=entry.data["app_secret"],
         email=entry.data["email"],
         password=entry.data["password"],
-        device_sn=entry.data["device_sn"]
+        device_sn=entry.data["device_sn"],
+        session=session,
+        recorder=recorder,
+        on_token_refresh=None if replay_file else persist_token,
     )
 
+    # Reuse the token from the last run; a rejected token falls back to a fresh login
+    saved_token = stored.get("token") or {}
+    if not replay_file and saved_token.get("credentials") == api.credentials_key:
+        if api.restore_token(saved_token.get("access_token"), saved_token.get("expiry", 0)):
+            _LOGGER.debug("Reusing stored access token for %s", entry.data["device_sn"])
+
     _LOGGER.debug(
         "Initialized DeyeCloudAPI with device_sn=%s for station %s",
         entry.data["device_sn"],
         entry.title
     )
 
-    from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+    # Look up the station this inverter belongs to, for the fleet totals and
+    # capabilities, unless both are still cached from an earlier start
+    known_station = cached_station(stored.get("station"), entry.data["device_sn"])
+    known_capabilities = cached_capabilities(stored.get("capabilities"), entry.data["device_sn"])
+    station, device = None, None
+    if known_station is not None and known_capabilities is not None:
+        station = known_station["station"]
+    else:
+        try:
+            station, device = find_station(await api.get_station_list_with_devices(), entry.data["device_sn"])
+            stored["station"] = station_record(entry.data["device_sn"], station)
+        except Exception as e:
+            _LOGGER.warning("Unable to look up station for %s, only account totals will include it: %s", entry.data["device_sn"], e)
+            if known_station is not None:
+                station = known_station["station"]
+
+    capabilities, cache_capabilities = await async_detect_capabilities(api, device, known_capabilities)
+    _LOGGER.debug("Capabilities of %s: %s", entry.data["device_sn"], capabilities)
 
-    # Create a dummy coordinator if not already done
-    coordinator = DataUpdateCoordinator(
+    coordinator = DeyeCoordinator(
         hass,
         _LOGGER,
         name=f"{DOMAIN}_{entry.entry_id}",
         update_method=api.get_realtime_data,
-        update_interval=timedelta(seconds=60),
+        update_interval=scan_interval,
     )
 
-    toucoordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name=f"{DOMAIN}_{entry.entry_id}",
-        update_method=api.get_time_of_use,
-        update_interval=timedelta(seconds=60),
-    )
+    toucoordinator = None
+    platforms = list(PLATFORMS)
+    if capabilities.get(CAPABILITY_TOU):
+        toucoordinator = DeyeCoordinator(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN}_{entry.entry_id}_tou",
+            update_method=api.get_time_of_use,
+            update_interval=scan_interval,
+        )
+        platforms += TOU_PLATFORMS
 
     # Perform the first data refresh to populate coordinator.data
     try:
         await coordinator.async_config_entry_first_refresh()
-        await toucoordinator.async_config_entry_first_refresh()
+        if toucoordinator:
+            await toucoordinator.async_config_entry_first_refresh()
     except Exception as e:
         _LOGGER.exception("Initial data refresh failed: %s", e)
+        await api.close()
         return False
 
+    fleet = async_get_fleet(hass, account_key(entry.data["base_url"], entry.data["email"]))
+    remove_from_fleet = fleet.async_add_device(entry.data["device_sn"], station, coordinator)
+
+    tou = DeyeTouManager(api, toucoordinator) if toucoordinator else None
+
+    def persist_alarms(state):
+        stored["alarms"] = state
+        store.async_delay_save(lambda: stored, 1)
+
+    # The alarm state of the last run saves a fetch on start when nothing changed since
+    alarms = DeyeAlarmMonitor(
+        hass,
+        api,
+        coordinator,
+        entry.data["device_sn"],
+        state=None if replay_file else stored.get("alarms"),
+        on_change=None if replay_file else persist_alarms,
+    )
+    alarms.async_start()
+
+    sample_sink = None
+    if entry.options.get(CONF_EXPORT_SAMPLES):
+        sample_sink = DeyeSampleSink(hass, coordinator, hass.config.path(f"{DOMAIN}_samples", entry.data["device_sn"]))
+        sample_sink.async_start()
+
+    if recorder or sample_sink:
+        # Entries are not unloaded at shutdown, so write out what is still buffered
+        async def flush_buffers(_event):
+            if recorder:
+                await recorder.async_flush()
+            if sample_sink:
+                await sample_sink.async_flush()
+
+        entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, flush_buffers))
+
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
         "api": api,
         "coordinator": coordinator,
-        "toucoordinator": toucoordinator
+        "toucoordinator": toucoordinator,
+        "tou": tou,
+        "fleet": fleet,
+        "remove_from_fleet": remove_from_fleet,
+        "alarms": alarms,
+        "sample_sink": sample_sink,
+        "capabilities": capabilities,
+        "platforms": platforms,
     }
 
-    # Save config to storage
-    store = Store(hass, 1, f"{DOMAIN}_{entry.entry_id}.json")
-    await store.async_save({
+    # Save config, and capabilities once they are known, to storage
+    if cache_capabilities:
+        stored["capabilities"] = cache_record(entry.data["device_sn"], capabilities)
+    stored.update({
         "base_url": entry.data["base_url"],
         "app_id": entry.data["app_id"],
         "app_secret": entry.data["app_secret"],
@@ -76,8 +202,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         "device_sn": entry.data["device_sn"],
         "station_name": entry.title
     })
+    await store.async_save(stored)
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    await hass.config_entries.async_forward_entry_setups(entry, platforms)
 
     # Register the refresh_data service only once for all instances
     if not hass.services.has_service(DOMAIN, "refresh_data"):
@@ -85,7 +212,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             """Handle manual refresh service call for all configured entries."""
             for instance in hass.data.get(DOMAIN, {}).values():
                 await instance["coordinator"].async_request_refresh()
-                await instance["toucoordinator"].async_request_refresh()
+                if instance["toucoordinator"]:
+                    await instance["toucoordinator"].async_request_refresh()
             _LOGGER.info("Manual refresh_data service triggered for all entries")
 
         hass.services.async_register(
@@ -94,14 +222,44 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             handle_refresh_service
         )
 
+    # Register the profile service only once for all instances
+    if not hass.services.has_service(DOMAIN, "profile"):
+        async def handle_profile_service(call):
+            """Start a cProfile capture of the event loop; the dump is written when it ends."""
+            path = hass.config.path(f"{DOMAIN}_profile_{int(time.time())}.prof")
+            try:
+                async_start_profile(hass, call.data["duration"], path)
+            except RuntimeError as e:
+                raise HomeAssistantError(str(e)) from e
+
+        hass.services.async_register(
+            DOMAIN,
+            "profile",
+            handle_profile_service,
+            schema=vol.Schema({
+                vol.Optional("duration", default=60): vol.All(vol.Coerce(float), vol.Range(min=1, max=3600)),
+            }),
+        )
+
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    platforms = hass.data[DOMAIN][entry.entry_id]["platforms"]
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, platforms)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        data["alarms"].async_stop()
+        if data["tou"]:
+            data["tou"].async_stop()
+        if data["sample_sink"]:
+            await data["sample_sink"].async_stop()
+        data["remove_from_fleet"]()
+        data["fleet"].release(entry.entry_id)
+        async_drop_fleet_if_empty(hass, data["fleet"])
+        await data["api"].close()
         if not hass.data[DOMAIN]:
             hass.services.async_remove(DOMAIN, "refresh_data")
+            hass.services.async_remove(DOMAIN, "profile")
     return unload_ok
 
 # Support config entry reloads
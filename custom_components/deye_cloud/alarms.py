@@ -0,0 +1,227 @@
+"""Alarm and fault tracking for a Deye inverter.
+
+Alarm details are only fetched from the cloud when one of the status, fault,
+alarm or warning keys in the realtime snapshot changes, plus once per
+``FALLBACK_INTERVAL`` in case a change happened between two polls. The
+active alarms are cached per device, and an ``EVENT_ALARM`` event is fired
+for every alarm that appears or clears. The alarms already active at the
+first fetch after setup are taken as the starting point without events.
+The monitor state can be saved and handed back on the next start, so a
+restart does not fetch alarms again when the status keys are unchanged.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_ALARM = f"{DOMAIN}_alarm"
+
+# Realtime keys containing one of these words are watched for changes
+STATUS_KEY_MARKERS = ("status", "fault", "alarm", "warning")
+
+FALLBACK_INTERVAL = timedelta(hours=6)
+ALARM_LOOKBACK = timedelta(days=1)
+# Alarms still active are looked up back to their start, but no further than this
+ALARM_MAX_LOOKBACK = timedelta(days=30)
+# Wait after a failed fetch, doubled on each further failure up to FALLBACK_INTERVAL
+RETRY_BACKOFF = timedelta(minutes=5)
+
+
+def status_fingerprint(data_list: list) -> tuple:
+    """Values of the status-like keys in a realtime snapshot."""
+    return tuple(sorted(
+        (item.get("key"), str(item.get("value")))
+        for item in data_list or []
+        if any(marker in (item.get("key") or "").lower() for marker in STATUS_KEY_MARKERS)
+    ))
+
+
+def _start_seconds(alarm: dict) -> float | None:
+    """Start time of an alarm as a Unix timestamp, if the cloud gave a numeric one."""
+    try:
+        start = float(alarm.get("startTime"))
+    except (TypeError, ValueError):
+        return None
+    # Timestamps in milliseconds
+    return start / 1000 if start > 1e11 else start
+
+
+def _alarm_id(alarm: dict) -> str:
+    if alarm.get("alertId") is not None:
+        return str(alarm["alertId"])
+    return f"{alarm.get('alertCode')}_{alarm.get('startTime')}"
+
+
+class DeyeAlarmMonitor:
+    """Keeps the set of active alarms for one device up to date."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api,
+        coordinator,
+        device_sn: str,
+        state: dict | None = None,
+        on_change: Callable[[dict], None] | None = None,
+    ):
+        self._hass = hass
+        self._api = api
+        self._coordinator = coordinator
+        self._device_sn = device_sn
+        self._on_change = on_change
+        # Fingerprint of the last snapshot whose alarms were fetched, and of
+        # the newest one still waiting for a fetch to succeed
+        self._fingerprint = None
+        self._pending = None
+        self._last_fetch = 0.0
+        self._fetching = False
+        self._dirty = False
+        self._seeded = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._unsubs = []
+        self.active: dict[str, dict] = {}
+        if state and state.get("device_sn") == device_sn:
+            self._fingerprint = tuple(tuple(item) for item in state.get("fingerprint", ()))
+            self._last_fetch = state.get("last_fetch", 0.0)
+            self.active = state.get("active", {})
+            self._seeded = True
+
+    @callback
+    def async_start(self):
+        self._unsubs.append(self._coordinator.async_add_listener(self._handle_update))
+        self._unsubs.append(
+            async_track_time_interval(self._hass, self._handle_fallback, FALLBACK_INTERVAL)
+        )
+        self._handle_update()
+        if not self._fetching:
+            # Restored state older than the fallback interval is refreshed now
+            self._handle_fallback(None)
+
+    @callback
+    def async_stop(self):
+        while self._unsubs:
+            self._unsubs.pop()()
+
+    @callback
+    def _handle_update(self):
+        if not self._coordinator.data or time.time() < self._retry_at:
+            return
+        fingerprint = status_fingerprint(self._coordinator.data)
+        if fingerprint in (self._fingerprint, self._pending):
+            return
+        _LOGGER.debug("Status keys changed for %s, fetching alarms", self._device_sn)
+        self._pending = fingerprint
+        self._schedule_fetch()
+
+    @callback
+    def _handle_fallback(self, _now):
+        now = time.time()
+        if now >= self._retry_at and now - self._last_fetch >= FALLBACK_INTERVAL.total_seconds():
+            self._schedule_fetch()
+
+    def _schedule_fetch(self):
+        # A request made while a fetch is running is picked up when it ends
+        self._dirty = True
+        if self._fetching:
+            return
+        self._fetching = True
+        self._hass.async_create_task(self._async_fetch())
+
+    async def _async_fetch(self):
+        try:
+            while self._dirty:
+                self._dirty = False
+                fingerprint = self._pending
+                now = int(time.time())
+                start = self._query_start(now)
+                try:
+                    alarms = await self._api.get_alarms(start, now)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Left uncommitted so the first poll after the backoff tries again
+                    self._pending = None
+                    self._failures += 1
+                    backoff = min(RETRY_BACKOFF * 2 ** (self._failures - 1), FALLBACK_INTERVAL)
+                    self._retry_at = time.time() + backoff.total_seconds()
+                    _LOGGER.warning(
+                        "Failed to fetch alarms for %s, retrying in %s: %s", self._device_sn, backoff, e
+                    )
+                    return
+
+                self._failures = 0
+                self._retry_at = 0.0
+
+                if fingerprint is not None:
+                    self._fingerprint = fingerprint
+                    if self._pending == fingerprint:
+                        self._pending = None
+                self._last_fetch = time.time()
+                self._apply(alarms, start)
+                if self._on_change:
+                    self._on_change(self.state())
+        finally:
+            self._fetching = False
+
+    def _query_start(self, now: int) -> int:
+        """Start of the alarm query: the lookback window, or the oldest active alarm."""
+        start = now - int(ALARM_LOOKBACK.total_seconds())
+        earliest = now - int(ALARM_MAX_LOOKBACK.total_seconds())
+        for alarm in self.active.values():
+            alarm_start = _start_seconds(alarm)
+            if alarm_start is not None:
+                start = min(start, max(int(alarm_start), earliest))
+        return start
+
+    def _apply(self, alarms: list, start: int):
+        returned = {_alarm_id(alarm): alarm for alarm in alarms}
+        active = {alarm_id: alarm for alarm_id, alarm in returned.items() if not alarm.get("endTime")}
+        # An active alarm that started before the queried range is not in the
+        # answer, which does not mean it cleared; keep it until it has an end time
+        for alarm_id, alarm in self.active.items():
+            if alarm_id not in returned:
+                alarm_start = _start_seconds(alarm)
+                if alarm_start is None or alarm_start < start:
+                    active[alarm_id] = alarm
+        if not self._seeded:
+            # Alarms raised before a restart or reload are not new
+            self._seeded = True
+            self.active = active
+            return
+
+        for alarm_id in active.keys() - self.active.keys():
+            self._fire("new", alarm_id, active[alarm_id])
+        for alarm_id in self.active.keys() - active.keys():
+            self._fire("cleared", alarm_id, self.active[alarm_id])
+        self.active = active
+
+    def state(self) -> dict:
+        """What to pass back as ``state`` on the next start."""
+        return {
+            "device_sn": self._device_sn,
+            "fingerprint": self._fingerprint or (),
+            "last_fetch": self._last_fetch,
+            "active": self.active,
+        }
+
+    def _fire(self, change: str, alarm_id: str, alarm: dict):
+        self._hass.bus.async_fire(EVENT_ALARM, {
+            "device_sn": self._device_sn,
+            "type": change,
+            "alarm_id": alarm_id,
+            "code": alarm.get("alertCode"),
+            "name": alarm.get("alertName"),
+            "level": alarm.get("level"),
+            "start_time": alarm.get("startTime"),
+        })
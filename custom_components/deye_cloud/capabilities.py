@@ -0,0 +1,79 @@
+"""Detection of what a Deye device supports.
+
+String inverters and microinverters have no time-of-use programs, so polling
+``/config/tou`` for them and creating TOU entities is wasted work. The model
+reported in the station listing decides where it is conclusive; otherwise a
+single ``/config/tou`` probe does, and the result is cached in the entry's
+store for ``CACHE_TTL`` so the probe is not repeated on every start.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPABILITY_TOU = "tou"
+
+TOU_PLATFORMS = ["number", "switch", "select"]
+
+# Substrings of Deye model names (e.g. SUN-12K-SG04LP3-EU) for hybrid inverters
+TOU_MODEL_MARKERS = ("-SG", "HYBRID")
+# ... and for string inverters (SUN-10K-G05) and microinverters (SUN-M80G3)
+NO_TOU_MODEL_MARKERS = ("SUN-M", "-G0", "MICRO")
+
+# How long detected capabilities are trusted before they are detected again
+CACHE_TTL = timedelta(days=7)
+
+
+def capabilities_from_listing(device: dict | None) -> dict | None:
+    """Capabilities of a ``deviceListItems`` entry, or None if it is not conclusive."""
+    if not device:
+        return None
+    if device.get("deviceType") and device["deviceType"] != "INVERTER":
+        return {CAPABILITY_TOU: False}
+    model = str(device.get("productId") or device.get("deviceModel") or "").upper()
+    if any(marker in model for marker in TOU_MODEL_MARKERS):
+        return {CAPABILITY_TOU: True}
+    if any(marker in model for marker in NO_TOU_MODEL_MARKERS):
+        return {CAPABILITY_TOU: False}
+    return None
+
+
+async def async_probe_capabilities(api) -> dict | None:
+    """Ask the cloud once; returns None if the probe itself failed."""
+    try:
+        tou_items = await api.get_time_of_use(raise_errors=True)
+    except Exception as e:
+        _LOGGER.warning("TOU capability probe failed, assuming TOU support for now: %s", e)
+        return None
+    return {CAPABILITY_TOU: bool(tou_items)}
+
+
+def cache_record(device_sn: str, capabilities: dict) -> dict:
+    """Entry store record for detected capabilities."""
+    return {"device_sn": device_sn, "capabilities": capabilities, "checked_at": time.time()}
+
+
+def cached_capabilities(record: dict | None, device_sn: str) -> dict | None:
+    """Capabilities from a store record, or None if it is for another device or expired."""
+    if not record or record.get("device_sn") != device_sn:
+        return None
+    checked_at = record.get("checked_at")
+    if checked_at is None or time.time() - checked_at > CACHE_TTL.total_seconds():
+        return None
+    return record.get("capabilities")
+
+
+async def async_detect_capabilities(api, device: dict | None, cached: dict | None) -> tuple[dict, bool]:
+    """Return the device capabilities and whether they should be cached."""
+    if cached is not None:
+        return cached, False
+
+    capabilities = capabilities_from_listing(device)
+    if capabilities is None:
+        capabilities = await async_probe_capabilities(api)
+    if capabilities is None:
+        return {CAPABILITY_TOU: True}, False
+    return capabilities, True
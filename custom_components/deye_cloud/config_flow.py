@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import voluptuous as vol
 from homeassistant import config_entries
@@ -6,7 +7,6 @@ from homeassistant.core import callback
 from homeassistant import exceptions
 
 from homeassistant.helpers.selector import TextSelector, TextSelectorConfig
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .const import (
     DOMAIN,
@@ -17,53 +17,107 @@ from .const import (
     CONF_PASSWORD,
     CONF_DEVICE_SN,
     CONF_STATION_LABEL,
+    CONF_RECORD_TRAFFIC,
+    CONF_REPLAY_FILE,
+    CONF_REPLAY_SPEED,
+    CONF_EXPORT_SAMPLES,
+    REGION_BASE_URLS,
+    REGION_PROBE_TIMEOUT,
 )
 
 from .deye_api import DeyeCloudAPI
 
 _LOGGER = logging.getLogger(__name__)
 
-# Schema for initial user input: base URL, app credentials, and user login info
+# Schema for initial user input: base URL (empty to detect the region), app credentials, and user login info
 STEP_USER_DATA_SCHEMA = vol.Schema({
-    vol.Required(CONF_BASE_URL): TextSelector(TextSelectorConfig(type="text")),
+    vol.Optional(CONF_BASE_URL, default=""): TextSelector(TextSelectorConfig(type="text")),
     vol.Required(CONF_APP_ID): TextSelector(TextSelectorConfig(type="text")),
     vol.Required(CONF_APP_SECRET): TextSelector(TextSelectorConfig(type="text")),
     vol.Required(CONF_EMAIL): TextSelector(TextSelectorConfig(type="text")),
     vol.Required(CONF_PASSWORD): TextSelector(TextSelectorConfig(type="text")),
 })
 
+def _build_api(base_url: str, user_input: dict) -> DeyeCloudAPI:
+    # device_sn will be set after inverter selection
+    return DeyeCloudAPI(
+        base_url=base_url,
+        app_id=user_input[CONF_APP_ID],
+        app_secret=user_input[CONF_APP_SECRET],
+        email=user_input[CONF_EMAIL],
+        password=user_input[CONF_PASSWORD],
+        device_sn=None
+    )
+
+async def _async_probe(api: DeyeCloudAPI) -> DeyeCloudAPI:
+    async with asyncio.timeout(REGION_PROBE_TIMEOUT):
+        # A region rejecting the login is expected here, the caller logs it
+        await api.authenticate(log_errors=False)
+    return api
+
+async def async_detect_region(user_input: dict) -> DeyeCloudAPI:
+    """Log in to every regional endpoint at once and return the first API that succeeds.
+
+    The remaining probes are cancelled and their sessions closed.
+    """
+    apis = [_build_api(base_url, user_input) for base_url in REGION_BASE_URLS.values()]
+    tasks = [asyncio.create_task(_async_probe(api)) for api in apis]
+    winner = None
+    try:
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task.result()
+                    break
+                _LOGGER.debug(
+                    "Login to %s failed: %s", apis[tasks.index(task)]._base_url, task.exception()
+                )
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for api in apis:
+            if api is not winner:
+                await api.close()
+
+    if winner is None:
+        raise ValueError("No regional endpoint accepted the credentials")
+    _LOGGER.info("Detected Deye Cloud region %s", winner._base_url)
+    return winner
+
 class DeyeCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
+    def __init__(self) -> None:
+        self._api = None
+
+    async def _async_close_api(self):
+        if self._api:
+            await self._api.close()
+            self._api = None
+
     async def async_step_user(self, user_input=None) -> FlowResult:
         errors = {}
         if user_input is not None:
             try:
-                # Initialize API with user credentials; device_sn will be set after inverter selection
-                api = DeyeCloudAPI(
-                    base_url=user_input[CONF_BASE_URL],
-                    app_id=user_input[CONF_APP_ID],
-                    app_secret=user_input[CONF_APP_SECRET],
-                    email=user_input[CONF_EMAIL],
-                    password=user_input[CONF_PASSWORD],
-                    device_sn=None  # Will be set after inverter selection
-                )
-                # Authenticate with the API
-                await api.authenticate()
+                await self._async_close_api()
+                base_url = user_input.get(CONF_BASE_URL, "").strip().rstrip("/")
+                if base_url:
+                    self._api = _build_api(base_url, user_input)
+                    await self._api.authenticate()
+                else:
+                    # Probe every region concurrently and keep the session that logged in
+                    self._api = await async_detect_region(user_input)
+                    base_url = self._api._base_url
                 _LOGGER.warning("✅ Deye authentication successful.")
-                # Retrieve headers needed for further API calls
-                headers = await api.get_headers()
-                # URL to fetch list of stations with devices
-                station_url = f"{user_input[CONF_BASE_URL]}/station/listWithDevice"
-                # Make POST request to get station and device info
-                async with api._session.post(
-                    station_url, headers=headers, json={"page": 1, "size": 50}
-                ) as resp:
-                    result = await resp.json()
+                # The authenticated session is reused for the station listing
+                station_list = await self._api.get_station_list_with_devices()
 
                 inverters = []
                 # Iterate over stations and devices to find inverters
-                for station in result.get("stationList", []):
+                for station in station_list:
                     name = station.get("name", "Unknown")
                     for device in station.get("deviceListItems", []):
                         if device.get("deviceType") == "INVERTER":
@@ -75,7 +129,7 @@ class DeyeCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     raise ValueError("No inverters found")
 
                 # Store user input and inverter choices for next step
-                self._user_input = user_input
+                self._user_input = {**user_input, CONF_BASE_URL: base_url}
                 self._inverter_choices = inverters
 
                 # Proceed to inverter selection step
@@ -83,6 +137,7 @@ class DeyeCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             except Exception as e:
                 _LOGGER.exception("❌ Authentication failed in config flow: %s", e)
+                await self._async_close_api()
                 # Authentication or API call failed, show error on form
                 errors["base"] = "auth_failed"
 
@@ -94,6 +149,7 @@ class DeyeCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             selected_sn = user_input[CONF_DEVICE_SN]
             label = dict(self._inverter_choices)[selected_sn]
+            await self._async_close_api()
             # Create the config entry with selected inverter info
             return self.async_create_entry(
                 title=label,
@@ -107,6 +163,12 @@ class DeyeCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         return self.async_show_form(step_id="select_inverter", data_schema=schema)
 
+    @callback
+    def async_remove(self) -> None:
+        """Close the API session if the flow is abandoned before an entry is created."""
+        if self._api:
+            self.hass.async_create_task(self._async_close_api())
+
     @staticmethod
     @callback
     def async_get_options_flow(
@@ -123,39 +185,40 @@ class DeyeCloudOptionsFlow(config_entries.OptionsFlow):
         errors = {}
         if user_input is not None:
             try:
-                # Create a temporary API client with updated input
-                session = async_get_clientsession(self.hass)
-                api = DeyeCloudAPI(
-                    base_url=self.config_entry.data[CONF_BASE_URL],
-                    app_id=user_input[CONF_APP_ID],
-                    app_secret=user_input[CONF_APP_SECRET],
-                    email=user_input[CONF_EMAIL],
-                    password=user_input[CONF_PASSWORD],
-                    device_sn=None
+                # Only log in when the credentials change, so record/replay options can be set offline
+                credentials_changed = any(
+                    user_input[key] != self.config_entry.data.get(key)
+                    for key in (CONF_APP_ID, CONF_APP_SECRET, CONF_EMAIL, CONF_PASSWORD)
                 )
-                await api.authenticate()
-                headers = await api.get_headers()
-                station_url = f"{self.config_entry.data[CONF_BASE_URL]}/station/listWithDevice"
-                async with api._session.post(
-                    station_url, headers=headers, json={"page": 1, "size": 50}
-                ) as resp:
-                    result = await resp.json()
-
-                valid_device_sns = {
-                    device["deviceSn"]
-                    for station in result.get("stationList", [])
-                    for device in station.get("deviceListItems", [])
-                    if device.get("deviceType") == "INVERTER"
-                }
-
                 # Get the current saved SN
                 current_sn = self.config_entry.data.get(CONF_DEVICE_SN)
+                valid_device_sns = {current_sn}
+                if credentials_changed:
+                    # Create a temporary API client with updated input
+                    api = _build_api(self.config_entry.data[CONF_BASE_URL], user_input)
+                    try:
+                        await api.authenticate()
+                        station_list = await api.get_station_list_with_devices()
+                    finally:
+                        await api.close()
+
+                    valid_device_sns = {
+                        device["deviceSn"]
+                        for station in station_list
+                        for device in station.get("deviceListItems", [])
+                        if device.get("deviceType") == "INVERTER"
+                    }
+
                 updated_data = {
                     **self.config_entry.data,
                     CONF_APP_ID: user_input[CONF_APP_ID],
                     CONF_APP_SECRET: user_input[CONF_APP_SECRET],
                     CONF_EMAIL: user_input[CONF_EMAIL],
                     CONF_PASSWORD: user_input[CONF_PASSWORD],
+                    CONF_RECORD_TRAFFIC: user_input.get(CONF_RECORD_TRAFFIC, False),
+                    CONF_REPLAY_FILE: user_input.get(CONF_REPLAY_FILE, ""),
+                    CONF_REPLAY_SPEED: user_input.get(CONF_REPLAY_SPEED, 1.0),
+                    CONF_EXPORT_SAMPLES: user_input.get(CONF_EXPORT_SAMPLES, False),
                 }
 
                 if current_sn not in valid_device_sns:
@@ -175,6 +238,10 @@ class DeyeCloudOptionsFlow(config_entries.OptionsFlow):
                 vol.Required(CONF_APP_SECRET, default=self.config_entry.data.get(CONF_APP_SECRET, "")): str,
                 vol.Required(CONF_EMAIL, default=self.config_entry.data.get(CONF_EMAIL, "")): str,
                 vol.Required(CONF_PASSWORD, default=self.config_entry.data.get(CONF_PASSWORD, "")): str,
+                vol.Optional(CONF_RECORD_TRAFFIC, default=self.config_entry.options.get(CONF_RECORD_TRAFFIC, False)): bool,
+                vol.Optional(CONF_REPLAY_FILE, default=self.config_entry.options.get(CONF_REPLAY_FILE, "")): str,
+                vol.Optional(CONF_REPLAY_SPEED, default=self.config_entry.options.get(CONF_REPLAY_SPEED, 1.0)): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(CONF_EXPORT_SAMPLES, default=self.config_entry.options.get(CONF_EXPORT_SAMPLES, False)): bool,
             }),
             errors=errors
         )
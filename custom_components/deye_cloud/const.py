@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 DOMAIN = "deye_cloud"
 
 # Configuration keys
@@ -9,5 +11,25 @@ CONF_PASSWORD = "password"
 CONF_DEVICE_SN = "device_sn"
 CONF_STATION_LABEL = "station_label"
 
+# Polling interval, and the shortest one used when replaying a recording faster
+DEFAULT_SCAN_INTERVAL = timedelta(seconds=60)
+MIN_REPLAY_SCAN_INTERVAL = timedelta(seconds=1)
+
+# Options for recording and replaying API traffic
+CONF_RECORD_TRAFFIC = "record_traffic"
+CONF_REPLAY_FILE = "replay_file"
+CONF_REPLAY_SPEED = "replay_speed"
+
+# Regional developer API endpoints probed when no base URL is given
+REGION_BASE_URLS = {
+    "eu": "https://eu1-developer.deyecloud.com/v1.0",
+    "us": "https://us1-developer.deyecloud.com/v1.0",
+}
+# Seconds a single region probe may take during setup
+REGION_PROBE_TIMEOUT = 15
+
+# Option for the high-resolution sample export
+CONF_EXPORT_SAMPLES = "export_samples"
+
 # Logging
 LOGGER_NAME = f"custom_components.{DOMAIN}"
\ No newline at end of file
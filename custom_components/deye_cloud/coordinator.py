@@ -0,0 +1,23 @@
+"""Data update coordinator with timing spans around each update phase."""
+from __future__ import annotations
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .profiling import span
+
+
+class DeyeCoordinator(DataUpdateCoordinator):
+    """Times the fetch of each update and the dispatch to its listeners.
+
+    Decoding is timed inside ``DeyeCloudAPI`` since it happens there.
+    """
+
+    async def _async_update_data(self):
+        with span(f"{self.name}.fetch"):
+            return await super()._async_update_data()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        with span(f"{self.name}.dispatch"):
+            super().async_update_listeners()
@@ -0,0 +1,47 @@
+"""JSON decoding for API responses.
+
+Uses orjson when it is installed (it ships with Home Assistant) and the
+standard library otherwise. Only the ``dataList`` of the polled device is
+kept from a realtime response, so the rest of the payload is not kept alive
+by the coordinator. The datapoints are returned as decoded; copying them
+into trimmed dicts cost more time than the few bytes it saved.
+"""
+from __future__ import annotations
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson else "json"
+
+
+def loads(raw: bytes):
+    """Decode a JSON response body."""
+    if orjson:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def extract_realtime(result: dict, device_sn: str | None = None) -> list[dict]:
+    """Return the datapoints of one device from a ``/device/latest`` response.
+
+    The first device is used without ``device_sn``, or when the response
+    holds a single device without a serial number. A response that does not
+    contain the device yields no datapoints, never another inverter's.
+    """
+    devices = result.get("deviceDataList") or []
+    if not devices:
+        return []
+    if device_sn is None or (len(devices) == 1 and not devices[0].get("deviceSn")):
+        return devices[0].get("dataList") or []
+    for device in devices:
+        if device.get("deviceSn") == device_sn:
+            return device.get("dataList") or []
+    return []
+
+
+def decode_realtime(raw: bytes, device_sn: str | None = None) -> list[dict]:
+    return extract_realtime(loads(raw), device_sn)
@@ -4,10 +4,21 @@ import asyncio
 import time
 import logging
 import json
+from urllib.parse import urlsplit
+
+from .decode import loads, extract_realtime
+from .profiling import span
 _LOGGER = logging.getLogger(__name__)
 
+# Tokens are renewed this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 300
+# Used when the login response does not say how long the token lasts
+DEFAULT_TOKEN_LIFETIME = 3600
+AUTH_REJECTED_STATUSES = (401, 403)
+
 class DeyeCloudAPI:
-    def __init__(self, base_url, app_id, app_secret, email, password, device_sn=None):
+    def __init__(self, base_url, app_id, app_secret, email, password, device_sn=None, session=None, recorder=None,
+                 on_token_refresh=None):
         """
         Initialize the API client.
 
@@ -17,6 +28,9 @@ class DeyeCloudAPI:
         :param email: User email
         :param password: User password
         :param device_sn: Device serial number (optional, can be set later with set_device)
+        :param session: Session to send requests with (optional, e.g. a ReplaySession)
+        :param recorder: TrafficRecorder that logs every request/response pair (optional)
+        :param on_token_refresh: Called with (token, expiry) after every login (optional)
         """
         self._base_url = base_url
         self._app_id = app_id
@@ -27,18 +41,79 @@ class DeyeCloudAPI:
 
         self._token = None
         self._token_expiry = 0  # Epoch time in seconds
-        self._session = aiohttp.ClientSession()
+        self._session = session or aiohttp.ClientSession()
+        self._recorder = recorder
+        self._on_token_refresh = on_token_refresh
 
     def set_device(self, device_sn: str):
         """Sets the active device serial number."""
         self._device_sn = device_sn
 
+    @property
+    def credentials_key(self) -> str:
+        """Hash identifying the credential set, to scope a persisted token to it."""
+        raw = "|".join((self._base_url, self._app_id, self._app_secret, self._email, self._password))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def restore_token(self, token: str, expiry: float) -> bool:
+        """Reuse a previously issued token if it is not about to expire."""
+        if not token or expiry - TOKEN_EXPIRY_MARGIN <= time.time():
+            return False
+        self._token = token
+        self._token_expiry = expiry
+        return True
+
+    def invalidate_token(self):
+        self._token = None
+        self._token_expiry = 0
+
     async def close(self):
+        if self._recorder:
+            await self._recorder.async_flush()
         await self._session.close()
 
-    async def authenticate(self):
+    async def _post(self, url, payload, headers=None, retry_auth=True):
+        """POST a JSON payload and return the decoded response body.
+
+        An authenticated request whose token is rejected logs in again and is
+        retried once.
+        """
+        started = time.monotonic()
+        status = None
+        result = None
+        rejected = False
+        try:
+            async with self._session.post(url, headers=headers, json=payload) as resp:
+                status = resp.status
+                if headers and retry_auth and status in AUTH_REJECTED_STATUSES:
+                    rejected = True
+                else:
+                    resp.raise_for_status()
+                    raw = await resp.read()
+                    with span(f"api.{urlsplit(url).path.rsplit('/', 1)[-1]}.decode", "decode"):
+                        result = loads(raw)
+        finally:
+            if self._recorder:
+                self._recorder.record(url, payload, status, result, time.monotonic() - started)
+
+        if headers and retry_auth and (rejected or self._is_token_error(result)):
+            _LOGGER.info("Access token was rejected, logging in again")
+            self.invalidate_token()
+            return await self._post(url, payload, await self.get_headers(), retry_auth=False)
+        return result
+
+    @staticmethod
+    def _is_token_error(result) -> bool:
+        """Whether a 200 response reports an invalid or expired token."""
+        return (
+            isinstance(result, dict)
+            and result.get("success") is False
+            and "token" in str(result.get("msg", "")).lower()
+        )
+
+    async def authenticate(self, log_errors=True):
         now = time.time()
-        if self._token and self._token_expiry > now:
+        if self._token and self._token_expiry - TOKEN_EXPIRY_MARGIN > now:
             return
 
         _LOGGER.debug("Authenticating with: base_url=%s app_id=%s email=%s", self._base_url, self._app_id, self._email)
@@ -52,16 +127,17 @@ class DeyeCloudAPI:
         }
 
         try:
-            async with self._session.post(url, json=payload) as resp:
-                resp.raise_for_status()
-                result = await resp.json()
-                if not result.get("accessToken"):
-                    raise ValueError("No accessToken returned")
-
-                self._token = result["accessToken"]
-                self._token_expiry = time.time() + 3600
+            result = await self._post(url, payload)
+            if not result.get("accessToken"):
+                raise ValueError("No accessToken returned")
+
+            self._token = result["accessToken"]
+            self._token_expiry = time.time() + int(result.get("expiresIn") or DEFAULT_TOKEN_LIFETIME)
+            if self._on_token_refresh:
+                self._on_token_refresh(self._token, self._token_expiry)
         except Exception as e:
-            _LOGGER.exception("Authentication failed: %s", e)
+            if log_errors:
+                _LOGGER.exception("Authentication failed: %s", e)
             raise
 
     async def get_station_list_with_devices(self):
@@ -70,11 +146,9 @@ class DeyeCloudAPI:
         headers = await self.get_headers()
         payload = {"page": 1, "size": 50}
 
-        async with self._session.post(url, headers=headers, json=payload) as resp:
-            resp.raise_for_status()
-            result = await resp.json()
-            _LOGGER.debug("Station list response: %s", result)
-            return result["stationList"]
+        result = await self._post(url, payload, headers)
+        _LOGGER.debug("Station list response: %s", result)
+        return result["stationList"]
 
     async def get_headers(self):
         await self.authenticate()
@@ -94,15 +168,13 @@ class DeyeCloudAPI:
 
         _LOGGER.info(f"Fetching realtime data for device {self._device_sn} from {url}")
         try:
-            async with self._session.post(url, headers=headers, json=payload) as resp:
-                resp.raise_for_status()
-                result = await resp.json()
-                return result.get("deviceDataList", [{}])[0].get("dataList", [])
+            result = await self._post(url, payload, headers)
+            return extract_realtime(result, self._device_sn)
         except Exception as e:
             _LOGGER.exception("Error fetching realtime data: %s", e)
             return []
 
-    async def get_time_of_use(self):
+    async def get_time_of_use(self, raise_errors=False):
         if not self._device_sn:
             raise ValueError("Device Serial Number not set when calling get_time_of_use. Call set_device() first.")
         
@@ -113,14 +185,36 @@ class DeyeCloudAPI:
 
         _LOGGER.info(f"Fetching TOU data for device {self._device_sn} from {url}")
         try:
-            async with self._session.post(url, headers=headers, json=payload) as resp:
-                resp.raise_for_status()
-                result = await resp.json()
-                return result.get("timeUseSettingItems", [])
+            result = await self._post(url, payload, headers)
+            items = result.get("timeUseSettingItems")
+            # An empty answer only means "no TOU" when the cloud says the request succeeded
+            if raise_errors and not items and result.get("success") is not True:
+                raise ValueError(f"TOU request was not successful: {result.get('msg')}")
+            return items or []
         except Exception as e:
+            if raise_errors:
+                raise
             _LOGGER.exception("Error fetching TOU data: %s", e)
             return []
 
+    async def get_alarms(self, start_timestamp: int, end_timestamp: int):
+        if not self._device_sn:
+            raise ValueError("Device Serial Number not set when calling get_alarms. Call set_device() first.")
+
+        url = f"{self._base_url}/device/alertList"
+        headers = await self.get_headers()
+        payload = {
+            "deviceSn": self._device_sn,
+            "startTimestamp": start_timestamp,
+            "endTimestamp": end_timestamp,
+            "page": 1,
+            "size": 100,
+        }
+
+        _LOGGER.info(f"Fetching alarms for device {self._device_sn} from {url}")
+        result = await self._post(url, payload, headers)
+        return result.get("alertList", [])
+
     def _normalize_time_format(self, time_str: str) -> str:
         """Converts time from 'HHMM' to 'HH:MM' format."""
         if len(time_str) == 4 and time_str.isdigit():
@@ -131,16 +225,16 @@ class DeyeCloudAPI:
         if not self._device_sn:
             raise ValueError("Device Serial Number not set when calling update_time_of_use. Call set_device() first.")
 
-        for item in tou_data:
-            if "time" in item:
-                item["time"] = self._normalize_time_format(item["time"])
+        # Normalize into copies so the caller's slots are left untouched
+        tou_data = [
+            {**item, "time": self._normalize_time_format(item["time"])} if "time" in item else dict(item)
+            for item in tou_data
+        ]
 
         url = f"{self._base_url}/order/sys/tou/update"
         headers = await self.get_headers()
         payload = {"deviceSn": self._device_sn, "timeUseSettingItems": tou_data}
 
         _LOGGER.info(f"Updating time of use data for device {self._device_sn} at {url} - {json.dumps(payload)}")
-        async with self._session.post(url, headers=headers, json=payload) as resp:
-            resp.raise_for_status()
-            result = await resp.json()
-            _LOGGER.debug("Update time of use response: %s", result)
\ No newline at end of file
+        result = await self._post(url, payload, headers)
+        _LOGGER.debug("Update time of use response: %s", result)
\ No newline at end of file
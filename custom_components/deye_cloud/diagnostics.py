@@ -9,6 +9,7 @@ from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.device_registry import DeviceEntry
 
 from .const import DOMAIN
+from .profiling import span_stats
 
 async def async_get_config_entry_diagnostics(
     hass: HomeAssistant,
@@ -22,6 +23,7 @@ async def async_get_config_entry_diagnostics(
 
     api = data.get("api")
     coordinator = data.get("coordinator")
+    alarms = data.get("alarms")
 
     result = {
         "config_entry": {
@@ -30,7 +32,10 @@ async def async_get_config_entry_diagnostics(
             "options": dict(entry.options),
         },
         "device_sn": getattr(api, "_device_sn", None),
+        "capabilities": data.get("capabilities"),
         "coordinator_data": coordinator.data if coordinator else None,
+        "active_alarms": list(alarms.active.values()) if alarms else None,
+        "timings": span_stats(),
     }
 
     return result
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""Station and account level totals across all configured inverters.
+
+Each config entry polls a single inverter. The fleet coordinator listens to
+every realtime coordinator of one Deye Cloud account and keeps running sums
+per station and for the whole account. When a device reports, only the
+difference between its new and previous contribution is applied, and a
+device that fails to update or is unloaded drops out of the totals.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+FLEET_DATA = f"{DOMAIN}_fleet"
+
+ACCOUNT_SCOPE = "account"
+
+# How long the station an inverter belongs to is trusted before it is looked up again
+STATION_CACHE_TTL = timedelta(days=1)
+
+# Sent to an entry, with a scope, when it takes over that scope's total sensors
+SIGNAL_FLEET_OWNER = f"{DOMAIN}_fleet_owner_{{}}"
+
+# Realtime keys read for each summed metric, first match wins
+SUMMED_METRICS = {
+    "pv_power": ("TotalSolarPower", "TotalDCInputPower"),
+    "load_power": ("TotalConsumptionPower", "UPSLoadPower"),
+    "grid_power": ("TotalGridPower", "GridPower"),
+}
+
+# State of charge is averaged, weighted by battery capacity when every device
+# with a SoC reports one, and equally otherwise
+SOC_KEYS = ("SOC", "BMSSOC")
+CAPACITY_KEYS = ("BMSRatedCapacity", "BatteryCapacity")
+
+FLEET_SENSORS = {
+    "pv_power": ("PV Power", "W"),
+    "load_power": ("Load Power", "W"),
+    "grid_import_power": ("Grid Import Power", "W"),
+    "grid_export_power": ("Grid Export Power", "W"),
+    "battery_soc": ("Battery SOC", "%"),
+    "devices_online": ("Devices Online", None),
+}
+
+
+def account_key(base_url: str, email: str) -> str:
+    """Stable, non-identifying key for a Deye Cloud account."""
+    return hashlib.sha1(f"{base_url}|{email.lower()}".encode("utf-8")).hexdigest()[:12]
+
+
+def find_station(station_list: list, device_sn: str) -> tuple[dict | None, dict | None]:
+    """Return the station from ``get_station_list_with_devices`` holding a device, and the device."""
+    for station in station_list or []:
+        for device in station.get("deviceListItems", []):
+            if device.get("deviceSn") == device_sn:
+                return station, device
+    return None, None
+
+
+def station_record(device_sn: str, station: dict | None) -> dict:
+    """Entry store record for the station of a device; ``station`` may be None."""
+    if station is not None:
+        station = {"id": station.get("id"), "name": station.get("name")}
+    return {"device_sn": device_sn, "station": station, "checked_at": time.time()}
+
+
+def cached_station(record: dict | None, device_sn: str) -> dict | None:
+    """A station store record, or None if it is for another device or expired."""
+    if not record or record.get("device_sn") != device_sn:
+        return None
+    checked_at = record.get("checked_at")
+    if checked_at is None or time.time() - checked_at > STATION_CACHE_TTL.total_seconds():
+        return None
+    return record
+
+
+def _to_float(item: dict) -> float | None:
+    try:
+        value = float(item.get("value"))
+    except (TypeError, ValueError):
+        return None
+    if (item.get("unit") or "").lower() == "kw":
+        value *= 1000
+    return value
+
+
+def device_contribution(data_list: list) -> dict[str, float]:
+    """Reduce one realtime snapshot to the values the fleet totals need.
+
+    Grid power is taken as positive when importing and negative when
+    exporting, and split into separate import and export terms.
+    """
+    by_key = {item.get("key"): item for item in data_list or []}
+
+    def first(keys):
+        for key in keys:
+            if key in by_key:
+                value = _to_float(by_key[key])
+                if value is not None:
+                    return value
+        return None
+
+    values = {"devices_online": 1.0}
+    for metric, keys in SUMMED_METRICS.items():
+        value = first(keys)
+        if value is None:
+            continue
+        if metric == "grid_power":
+            values["grid_import_power"] = max(value, 0.0)
+            values["grid_export_power"] = max(-value, 0.0)
+        else:
+            values[metric] = value
+
+    soc = first(SOC_KEYS)
+    if soc is not None:
+        values["soc_sum"] = soc
+        values["soc_count"] = 1.0
+        capacity = first(CAPACITY_KEYS)
+        if capacity:
+            values["soc_weighted"] = soc * capacity
+            values["soc_weight"] = capacity
+            values["soc_weight_count"] = 1.0
+    return values
+
+
+class DeyeFleetCoordinator(DataUpdateCoordinator):
+    """Push-only coordinator holding totals per station and per account.
+
+    ``data`` maps a scope (a station id or ``ACCOUNT_SCOPE``) to a dict of
+    the keys in ``FLEET_SENSORS``.
+    """
+
+    def __init__(self, hass: HomeAssistant, key: str):
+        super().__init__(hass, _LOGGER, name=f"{DOMAIN}_fleet_{key}", update_interval=None)
+        self.key = key
+        self.data = {}
+        self.station_names: dict[str, str] = {}
+        self._scopes: dict[str, tuple[str, ...]] = {}
+        self._contributions: dict[str, dict[str, float]] = {}
+        self._sums: dict[str, dict[str, float]] = {}
+        self._owners: dict[str, str] = {}
+        self._members: dict[str, list[str]] = {}
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._scopes
+
+    @callback
+    def async_add_device(self, device_sn: str, station: dict | None, coordinator):
+        """Track a device's realtime coordinator; returns a callback that removes it."""
+        scopes = [ACCOUNT_SCOPE]
+        if station and station.get("id") is not None:
+            station_id = str(station["id"])
+            scopes.insert(0, station_id)
+            self.station_names[station_id] = station.get("name", f"Station {station_id}")
+        self._scopes[device_sn] = tuple(scopes)
+
+        @callback
+        def _handle_update():
+            if coordinator.last_update_success and coordinator.data:
+                self._apply(device_sn, device_contribution(coordinator.data))
+            else:
+                self._apply(device_sn, {})
+
+        remove_listener = coordinator.async_add_listener(_handle_update)
+        _handle_update()
+
+        @callback
+        def _remove():
+            remove_listener()
+            self._apply(device_sn, {})
+            self._scopes.pop(device_sn, None)
+            self._contributions.pop(device_sn, None)
+
+        return _remove
+
+    def scopes_for(self, device_sn: str) -> tuple[str, ...]:
+        return self._scopes.get(device_sn, ())
+
+    def claim(self, scope: str, entry_id: str) -> bool:
+        """Join a scope; the first entry to join creates its sensors."""
+        members = self._members.setdefault(scope, [])
+        if entry_id not in members:
+            members.append(entry_id)
+        owner = self._owners.setdefault(scope, entry_id)
+        return owner == entry_id
+
+    @callback
+    def release(self, entry_id: str):
+        """Leave every scope, handing owned ones to the next remaining member."""
+        for scope, members in list(self._members.items()):
+            if entry_id in members:
+                members.remove(entry_id)
+            if self._owners.get(scope) != entry_id:
+                continue
+            del self._owners[scope]
+            if members:
+                self._owners[scope] = members[0]
+                async_dispatcher_send(self.hass, SIGNAL_FLEET_OWNER.format(members[0]), scope)
+            else:
+                del self._members[scope]
+
+    def _apply(self, device_sn: str, new: dict[str, float]):
+        old = self._contributions.get(device_sn, {})
+        if new == old:
+            return
+        self._contributions[device_sn] = new
+        for scope in self._scopes.get(device_sn, ()):
+            sums = self._sums.setdefault(scope, {})
+            for name in old.keys() | new.keys():
+                sums[name] = sums.get(name, 0.0) + new.get(name, 0.0) - old.get(name, 0.0)
+        self.async_set_updated_data(self._snapshot())
+
+    def _snapshot(self) -> dict[str, dict]:
+        snapshot = {}
+        for scope, sums in self._sums.items():
+            totals = {
+                name: round(sums[name], 3)
+                for name in FLEET_SENSORS
+                if name in sums and name != "battery_soc"
+            }
+            count = round(sums.get("soc_count", 0.0))
+            weight = sums.get("soc_weight", 0.0)
+            if count and round(sums.get("soc_weight_count", 0.0)) == count and weight > 0:
+                totals["battery_soc"] = round(sums["soc_weighted"] / weight, 1)
+            elif count:
+                totals["battery_soc"] = round(sums["soc_sum"] / count, 1)
+            else:
+                totals["battery_soc"] = None
+            totals["devices_online"] = int(round(sums.get("devices_online", 0.0)))
+            snapshot[scope] = totals
+        return snapshot
+
+
+def async_get_fleet(hass: HomeAssistant, key: str) -> DeyeFleetCoordinator:
+    fleets = hass.data.setdefault(FLEET_DATA, {})
+    if key not in fleets:
+        fleets[key] = DeyeFleetCoordinator(hass, key)
+    return fleets[key]
+
+
+def async_drop_fleet_if_empty(hass: HomeAssistant, fleet: DeyeFleetCoordinator):
+    if fleet.is_empty:
+        hass.data.get(FLEET_DATA, {}).pop(fleet.key, None)
@@ -2,7 +2,8 @@ from __future__ import annotations
 import logging
 
 from homeassistant.components.number import NumberEntity
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.const import PERCENTAGE
@@ -10,11 +11,13 @@ from homeassistant.helpers.entity import EntityCategory
 from homeassistant.components.number import NumberDeviceClass
 
 from . import DOMAIN
+from .profiling import timed_setup
+from .tou import TouStaleError, TouValidationError
 
 _LOGGER = logging.getLogger(__name__)
 
 class DeyeTOUBatteryNumber(NumberEntity):
-    def __init__(self, coordinator, api, slot_index, program, entry):
+    def __init__(self, coordinator, api, tou, slot_index, program, entry):
         from .helpers import build_device_info
 
         self._key = "soc"
@@ -22,6 +25,8 @@ class DeyeTOUBatteryNumber(NumberEntity):
         self._index_string  = str(slot_index + 1)
         self._coordinator = coordinator
         self._api = api
+        self._tou = tou
+        self._tou_version = tou.version
         self._slot_index = slot_index
         self._device_sn = entry.data["device_sn"]
 
@@ -45,19 +50,30 @@ class DeyeTOUBatteryNumber(NumberEntity):
         }
 
     async def async_set_native_value(self, value: float):
-        tou_config = await self._api.get_time_of_use()
-        tou_config[self._slot_index][self._key] = int(value)
-        await self._api.update_time_of_use(tou_config)
+        try:
+            await self._tou.async_update_slot(self._slot_index, self._tou_version, soc=int(value))
+        except TouStaleError as e:
+            self._handle_tou_update()
+            raise HomeAssistantError(str(e)) from e
+        except TouValidationError as e:
+            raise HomeAssistantError(str(e)) from e
         self._attr_native_value = int(value)
-        await self._coordinator.async_request_refresh()
         self.async_write_ha_state()
 
-    async def async_added_to_hass(self):
-        self._coordinator.async_add_listener(self.async_write_ha_state)
+    @callback
+    def _handle_tou_update(self):
+        try:
+            self._attr_native_value = self._coordinator.data[self._slot_index].get(self._key)
+        except (IndexError, KeyError, TypeError):
+            _LOGGER.debug("TOU slot %s missing from coordinator data", self._index_string)
+        # Edits are checked against the schedule version this state was rendered from
+        self._tou_version = self._tou.version
+        self.async_write_ha_state()
 
-    async def async_will_remove_from_hass(self):
-        self._coordinator.async_remove_listener(self.async_write_ha_state)
+    async def async_added_to_hass(self):
+        self.async_on_remove(self._coordinator.async_add_listener(self._handle_tou_update))
 
+@timed_setup("number")
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -66,6 +82,7 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator = data["toucoordinator"]
     api = data["api"]
+    tou = data["tou"]
 
     tou_data = coordinator.data
     if not tou_data:
@@ -78,6 +95,6 @@ async def async_setup_entry(
 
     controls = []
     for index, program in enumerate(tou_data):
-        controls.append(DeyeTOUBatteryNumber(coordinator, api, index, program, entry))
+        controls.append(DeyeTOUBatteryNumber(coordinator, api, tou, index, program, entry))
 
     async_add_entities(controls)
\ No newline at end of file
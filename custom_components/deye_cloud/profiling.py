@@ -0,0 +1,117 @@
+"""Timing spans and profiling for the integration's own code paths.
+
+``span`` measures a block, keeps running totals per name and logs a warning
+when the block takes longer than its budget. The ``fetch`` phase covers the
+network round-trip and so measures wall time; decode, dispatch and setup run
+without awaiting the network, so their time is event-loop time.
+``async_start_profile`` runs cProfile on the event loop thread in the
+background for a limited time and writes both the raw stats and a text
+report restricted to this integration.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import time
+from contextlib import contextmanager
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds a phase may take before a slow-callback warning is logged
+PHASE_BUDGETS = {
+    "fetch": 15.0,
+    "decode": 0.05,
+    "dispatch": 0.1,
+    "setup": 0.5,
+}
+
+_stats: dict[str, dict] = {}
+_profiling = False
+
+
+@contextmanager
+def span(name: str, phase: str | None = None):
+    """Time a block; ``phase`` selects the budget from ``PHASE_BUDGETS``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stat = _stats.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+        stat["count"] += 1
+        stat["total"] += elapsed
+        stat["last"] = elapsed
+        stat["max"] = max(stat["max"], elapsed)
+        budget = PHASE_BUDGETS.get(phase or name.rsplit(".", 1)[-1])
+        if budget is not None and elapsed > budget:
+            _LOGGER.warning("%s took %.3fs, over its %.3fs budget", name, elapsed, budget)
+
+
+def timed_setup(platform: str):
+    """Wrap a platform's ``async_setup_entry`` in a setup span."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(hass, entry, *args, **kwargs):
+            with span(f"{platform}.setup"):
+                return await func(hass, entry, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def span_stats() -> dict[str, dict]:
+    """Totals per span, in milliseconds, for diagnostics."""
+    return {
+        name: {
+            "count": stat["count"],
+            "total_ms": round(stat["total"] * 1000, 2),
+            "mean_ms": round(stat["total"] * 1000 / stat["count"], 2),
+            "max_ms": round(stat["max"] * 1000, 2),
+            "last_ms": round(stat["last"] * 1000, 2),
+        }
+        for name, stat in sorted(_stats.items())
+    }
+
+
+def _write_profile(profiler: cProfile.Profile, path: str):
+    profiler.dump_stats(path)
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats("cumulative").print_stats(DOMAIN)
+    with open(f"{path}.txt", "w", encoding="utf-8") as fh:
+        fh.write(report.getvalue())
+
+
+def async_start_profile(hass, duration: float, path: str):
+    """Start profiling the event loop thread for ``duration`` seconds in the background.
+
+    Raises RuntimeError if a capture is already running.
+    """
+    global _profiling
+    if _profiling:
+        raise RuntimeError("A Deye Cloud profile is already being captured")
+    _profiling = True
+    hass.async_create_background_task(_async_capture_profile(hass, duration, path), f"{DOMAIN} profile")
+    _LOGGER.warning("Profiling the event loop for %ss, writing to %s", duration, path)
+
+
+async def _async_capture_profile(hass, duration: float, path: str):
+    global _profiling
+    profiler = cProfile.Profile()
+    try:
+        try:
+            profiler.enable()
+            await asyncio.sleep(duration)
+        finally:
+            profiler.disable()
+        await hass.async_add_executor_job(_write_profile, profiler, path)
+        _LOGGER.warning("Deye Cloud profile written to %s (report in %s.txt)", path, path)
+    except OSError as e:
+        _LOGGER.error("Unable to write Deye Cloud profile to %s: %s", path, e)
+    finally:
+        _profiling = False
@@ -0,0 +1,204 @@
+"""Compact on-disk history of every realtime snapshot.
+
+Each device gets one pair of files per UTC day in its own directory:
+
+``YYYYMMDD.dcs``
+    Append-only sequence of zlib-compressed column blocks. A block holds a
+    batch of snapshots: a header with the row count and the column names
+    and units, then the float64 timestamps, then one float64 column per
+    datapoint with NaN where a snapshot had no numeric value.
+``YYYYMMDD.dcs.idx``
+    One fixed-size record per block with its first and last timestamp,
+    offset and length, so a time range can be read without scanning the
+    data file.
+
+The reader functions only need the standard library, so recordings can be
+analysed outside Home Assistant.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_SUFFIX = ".dcs"
+INDEX_SUFFIX = ".dcs.idx"
+
+# first timestamp, last timestamp, offset, length
+_INDEX_RECORD = struct.Struct("<ddQI")
+# rows, length of the JSON column header
+_BLOCK_HEADER = struct.Struct("<II")
+
+# Snapshots buffered before a block is written
+BATCH_SIZE = 10
+
+
+def _day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%d")
+
+
+def encode_block(rows: list[tuple[float, dict]]) -> bytes:
+    """Encode ``(timestamp, {key: (value, unit)})`` rows as one compressed block."""
+    columns: dict[str, str | None] = {}
+    for _, values in rows:
+        for key, (_, unit) in values.items():
+            columns.setdefault(key, unit)
+    names = list(columns)
+    header = json.dumps([[name, columns[name]] for name in names], separators=(",", ":")).encode("utf-8")
+
+    body = [_BLOCK_HEADER.pack(len(rows), len(header)), header, array("d", (ts for ts, _ in rows)).tobytes()]
+    nan = math.nan
+    for name in names:
+        body.append(array("d", (values[name][0] if name in values else nan for _, values in rows)).tobytes())
+    return zlib.compress(b"".join(body), 6)
+
+
+def decode_block(block: bytes) -> dict[str, array]:
+    """Decode a block into ``{"timestamp": array, key: array, ...}``."""
+    raw = zlib.decompress(block)
+    count, header_len = _BLOCK_HEADER.unpack_from(raw)
+    offset = _BLOCK_HEADER.size
+    names = json.loads(raw[offset:offset + header_len])
+    offset += header_len
+
+    width = count * 8
+    columns = {"timestamp": array("d", raw[offset:offset + width])}
+    offset += width
+    for name, _unit in names:
+        columns[name] = array("d", raw[offset:offset + width])
+        offset += width
+    return columns
+
+
+def append_block(directory: str, rows: list[tuple[float, dict]]):
+    """Write rows, all from one UTC day, as a block. Blocking."""
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, _day(rows[0][0]))
+    block = encode_block(rows)
+    with open(base + DATA_SUFFIX, "ab") as data:
+        offset = data.tell()
+        data.write(block)
+    with open(base + INDEX_SUFFIX, "ab") as index:
+        index.write(_INDEX_RECORD.pack(rows[0][0], rows[-1][0], offset, len(block)))
+
+
+def _read_index(path: str) -> list[tuple[float, float, int, int]]:
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    usable = len(raw) - len(raw) % _INDEX_RECORD.size
+    return list(_INDEX_RECORD.iter_unpack(raw[:usable]))
+
+
+def iter_blocks(directory: str, start: float, end: float):
+    """Yield decoded blocks overlapping ``[start, end]``, one at a time.
+
+    Data files are memory-mapped and only the blocks listed in the index as
+    overlapping the range are decompressed.
+    """
+    day = datetime.fromtimestamp(start, timezone.utc).date()
+    last_day = datetime.fromtimestamp(end, timezone.utc).date()
+    while day <= last_day:
+        base = os.path.join(directory, day.strftime("%Y%m%d"))
+        day += timedelta(days=1)
+        if not os.path.exists(base + INDEX_SUFFIX) or not os.path.exists(base + DATA_SUFFIX):
+            continue
+        # A data file left empty by an interrupted write cannot be mapped
+        if os.path.getsize(base + DATA_SUFFIX) == 0:
+            continue
+        blocks = [record for record in _read_index(base + INDEX_SUFFIX) if record[1] >= start and record[0] <= end]
+        if not blocks:
+            continue
+        with open(base + DATA_SUFFIX, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for _first, _last, offset, length in blocks:
+                yield decode_block(data[offset:offset + length])
+
+
+def read_range(directory: str, start: float, end: float, keys: list[str] | None = None) -> dict[str, array]:
+    """Return the columns for ``[start, end]``, optionally limited to ``keys``.
+
+    A key missing from some blocks is filled with NaN for their rows.
+    """
+    result: dict[str, array] = {"timestamp": array("d")}
+    for block in iter_blocks(directory, start, end):
+        timestamps = block["timestamp"]
+        selected = [i for i, ts in enumerate(timestamps) if start <= ts <= end]
+        if not selected:
+            continue
+        rows_before = len(result["timestamp"])
+        result["timestamp"].extend(timestamps[i] for i in selected)
+        for name, column in block.items():
+            if name == "timestamp" or (keys is not None and name not in keys):
+                continue
+            target = result.setdefault(name, array("d", [math.nan]) * rows_before)
+            target.extend(column[i] for i in selected)
+        for name, column in result.items():
+            if len(column) < len(result["timestamp"]):
+                column.extend([math.nan] * (len(result["timestamp"]) - len(column)))
+    return result
+
+
+def snapshot_values(data_list: list) -> dict[str, tuple[float, str | None]]:
+    """Numeric datapoints of a realtime snapshot as ``{key: (value, unit)}``."""
+    values = {}
+    for item in data_list or []:
+        try:
+            values[item["key"]] = (float(item.get("value")), item.get("unit"))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return values
+
+
+class DeyeSampleSink:
+    """Buffers realtime snapshots of one device and writes them in batches."""
+
+    def __init__(self, hass, coordinator, directory: str, batch_size: int = BATCH_SIZE):
+        self._hass = hass
+        self._coordinator = coordinator
+        self._directory = directory
+        self._batch_size = batch_size
+        self._rows: list[tuple[float, dict]] = []
+        self._lock = asyncio.Lock()
+        self._unsub = None
+
+    def async_start(self):
+        self._unsub = self._coordinator.async_add_listener(self._handle_update)
+
+    async def async_stop(self):
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+        await self.async_flush()
+
+    def _handle_update(self):
+        if not self._coordinator.last_update_success:
+            return
+        values = snapshot_values(self._coordinator.data)
+        if not values:
+            return
+        self._rows.append((time.time(), values))
+        if len(self._rows) >= self._batch_size:
+            self._hass.async_create_task(self.async_flush())
+
+    async def async_flush(self):
+        # Serialised so blocks land in the files in order
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            # A batch that spans midnight goes into two daily files
+            by_day: dict[str, list] = {}
+            for row in rows:
+                by_day.setdefault(_day(row[0]), []).append(row)
+            for day_rows in by_day.values():
+                try:
+                    await self._hass.async_add_executor_job(append_block, self._directory, day_rows)
+                except OSError as e:
+                    _LOGGER.error("Unable to write samples to %s: %s", self._directory, e)
@@ -3,16 +3,20 @@ from __future__ import annotations
 import logging
 from homeassistant.components.select import SelectEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity import EntityCategory
 
 from . import DOMAIN
 from .helpers import build_device_info
+from .profiling import timed_setup
+from .tou import TouStaleError, TouValidationError
 
 _LOGGER = logging.getLogger(__name__)
 
+@timed_setup("select")
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -21,6 +25,7 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     toucoordinator = data["toucoordinator"]
     api = data["api"]
+    tou = data["tou"]
 
     tou_data = toucoordinator.data
     if not tou_data:
@@ -35,15 +40,17 @@ async def async_setup_entry(
     options = [f"{h:02d}:{m:02d}" for h in range(24) for m in (0, 30)]
 
     for i, program in enumerate(tou_data):
-        entities.append(DeyeTOUTimeSelect(toucoordinator, api, entry, i, program, options))
+        entities.append(DeyeTOUTimeSelect(toucoordinator, api, tou, entry, i, program, options))
 
     async_add_entities(entities)
 
 class DeyeTOUTimeSelect(CoordinatorEntity, SelectEntity):
-    def __init__(self, coordinator, api, entry, index, program, options):
+    def __init__(self, coordinator, api, tou, entry, index, program, options):
         super().__init__(coordinator)
         from .helpers import build_device_info
         self.api = api
+        self.tou = tou
+        self.tou_version = tou.version
         self.index = index
         self._attr_name = f"Prog {index+1} Time"
         self._attr_unique_id = f"deye_{entry.data['device_sn']}_tou_{index+1}_time"
@@ -58,19 +65,28 @@ class DeyeTOUTimeSelect(CoordinatorEntity, SelectEntity):
             raw = self.coordinator.data[self.index].get("time")
             if raw and len(raw) == 4 and raw.isdigit():
                 return f"{raw[:2]}:{raw[2:]}"
+            if raw in self._attr_options:
+                return raw
             return None
         except Exception as e:
             _LOGGER.warning(f"Unable to get current TOU time option: {e}")
             return None
 
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        # Edits are checked against the schedule version this state was rendered from
+        self.tou_version = self.tou.version
+        super()._handle_coordinator_update()
+
     async def async_select_option(self, option: str) -> None:
         try:
-            formatted = option.replace(":", "")
-            tou_config = await self.api.get_time_of_use()
-            tou_config[self.index]["time"] = formatted
-            await self.api.update_time_of_use(tou_config)
-            await self.coordinator.async_request_refresh()
+            await self.tou.async_update_slot(self.index, self.tou_version, time=option)
             self._attr_current_option = option
             self.async_write_ha_state()
+        except TouStaleError as e:
+            self._handle_coordinator_update()
+            raise HomeAssistantError(str(e)) from e
+        except TouValidationError as e:
+            raise HomeAssistantError(str(e)) from e
         except Exception as e:
             _LOGGER.error(f"Failed to set TOU time: {e}")
\ No newline at end of file
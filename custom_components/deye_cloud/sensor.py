@@ -2,15 +2,18 @@ from __future__ import annotations
 
 import logging
 from datetime import timedelta
-from homeassistant.core import HomeAssistant
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, CoordinatorEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
 DOMAIN = "deye_cloud"
 from .deye_api import DeyeCloudAPI
+from .fleet import ACCOUNT_SCOPE, FLEET_SENSORS, SIGNAL_FLEET_OWNER
+from .profiling import timed_setup
 
 _LOGGER = logging.getLogger(__name__)
 SCAN_INTERVAL = timedelta(seconds=60)
@@ -64,7 +67,45 @@ class DeyeRealtimeSensor(CoordinatorEntity, RestoreEntity, SensorEntity):
     @property
     def available(self) -> bool:
         return self.coordinator.last_update_success
-    
+
+class DeyeFleetSensor(CoordinatorEntity, SensorEntity):
+    """Total or weighted average over the inverters of a station or account."""
+
+    def __init__(self, fleet, scope, metric):
+        super().__init__(fleet)
+        self._scope = scope
+        self._metric = metric
+
+        name, unit = FLEET_SENSORS[metric]
+        if scope == ACCOUNT_SCOPE:
+            device_id = f"account_{fleet.key}"
+            device_name = "Deye Cloud Account"
+            model = "Account"
+        else:
+            device_id = f"station_{scope}"
+            device_name = fleet.station_names.get(scope, f"Station {scope}")
+            model = "Station"
+
+        self._attr_name = name
+        self._attr_unique_id = f"deye_{device_id}_{metric}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        if unit == "W":
+            self._attr_device_class = SensorDeviceClass.POWER
+        elif unit == "%":
+            self._attr_device_class = SensorDeviceClass.BATTERY
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, device_id)},
+            "name": device_name,
+            "manufacturer": "Deye",
+            "model": model,
+        }
+
+    @property
+    def native_value(self):
+        return (self.coordinator.data or {}).get(self._scope, {}).get(self._metric)
+
+@timed_setup("sensor")
 async def async_setup_entry(
     hass: HomeAssistant,
     entry : ConfigEntry,
@@ -76,9 +117,25 @@ async def async_setup_entry(
 
     sensors: list[SensorEntity] = []
 
+    # The first entry of each station and of the account owns its total sensors;
+    # when the owner goes away the fleet hands them to another member
+    fleet = data["fleet"]
+
+    @callback
+    def take_over_scope(scope):
+        async_add_entities([DeyeFleetSensor(fleet, scope, metric) for metric in FLEET_SENSORS])
+
+    entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_FLEET_OWNER.format(entry.entry_id), take_over_scope)
+    )
+    for scope in fleet.scopes_for(entry.data["device_sn"]):
+        if fleet.claim(scope, entry.entry_id):
+            sensors.extend(DeyeFleetSensor(fleet, scope, metric) for metric in FLEET_SENSORS)
+
     _LOGGER.info("Setting up Deye realtime sensors")
     if not coordinator.data:
         _LOGGER.warning("Coordinator returned no data during setup")
+        async_add_entities(sensors)
         return
     for sensor in coordinator.data:
         key = sensor.get("key")
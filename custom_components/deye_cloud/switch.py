@@ -1,12 +1,16 @@
 import logging
 from homeassistant.components.switch import SwitchEntity
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity import EntityCategory
 from .const import DOMAIN
+from .tou import API_FIELDS, TouStaleError, TouValidationError
+from .profiling import timed_setup
 
 _LOGGER = logging.getLogger(__name__)
 
 class DeyeTOUSwitch(SwitchEntity):
-    def __init__(self, coordinator, api, slot_index, key, name, program, entry):
+    def __init__(self, coordinator, api, tou, slot_index, key, name, program, entry):
         from .helpers import build_device_info
 
         self._key = key
@@ -14,6 +18,8 @@ class DeyeTOUSwitch(SwitchEntity):
         self._index_string  = str(slot_index + 1)
         self._coordinator = coordinator
         self._api = api
+        self._tou = tou
+        self._tou_version = tou.version
         self._slot_index = slot_index
         self._device_sn = entry.data["device_sn"]
 
@@ -42,29 +48,38 @@ class DeyeTOUSwitch(SwitchEntity):
 
     async def async_turn_on(self, **kwargs):
         await self._update_switch_value(True)
-        await self._coordinator.async_request_refresh()
 
     async def async_turn_off(self, **kwargs):
         await self._update_switch_value(False)
-        await self._coordinator.async_request_refresh()
 
     async def _update_switch_value(self, new_value):
-        tou_config = await self._api.get_time_of_use()
-        tou_config[self._slot_index][self._key] = new_value
-        await self._api.update_time_of_use(tou_config)
+        try:
+            await self._tou.async_update_slot(
+                self._slot_index, self._tou_version, **{API_FIELDS[self._key]: new_value}
+            )
+        except TouStaleError as e:
+            self._handle_tou_update()
+            raise HomeAssistantError(str(e)) from e
+        except TouValidationError as e:
+            raise HomeAssistantError(str(e)) from e
         self._attr_native_value = new_value
         self.async_write_ha_state()
 
-    async def async_added_to_hass(self):
-        self._coordinator.async_add_listener(self.async_write_ha_state)
+    @callback
+    def _handle_tou_update(self):
+        # Edits are checked against the schedule version this state was rendered from
+        self._tou_version = self._tou.version
+        self.async_write_ha_state()
 
-    async def async_will_remove_from_hass(self):
-        self._coordinator.async_remove_listener(self.async_write_ha_state)
+    async def async_added_to_hass(self):
+        self.async_on_remove(self._coordinator.async_add_listener(self._handle_tou_update))
 
+@timed_setup("switch")
 async def async_setup_entry(hass, entry, async_add_entities):
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator = data["toucoordinator"]
     api = data["api"]
+    tou = data["tou"]
 
     if not coordinator.data:
         _LOGGER.warning("Coordinator returned no data during setup")
@@ -76,7 +91,7 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
     switches = []
     for index, program in enumerate(tou_data):
-        switches.append(DeyeTOUSwitch(coordinator, api, index, "enableGridCharge", "Grid Charge", program, entry))
-        switches.append(DeyeTOUSwitch(coordinator, api, index, "enableGeneration", "Generation", program, entry))
+        switches.append(DeyeTOUSwitch(coordinator, api, tou, index, "enableGridCharge", "Grid Charge", program, entry))
+        switches.append(DeyeTOUSwitch(coordinator, api, tou, index, "enableGeneration", "Generation", program, entry))
 
     async_add_entities(switches)        
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""Time-of-use schedule model.
+
+``TouSchedule`` is an immutable copy of the slots returned by
+``get_time_of_use``. Edits produce a new schedule that is validated locally,
+so an invalid schedule never reaches the cloud. ``DeyeTouManager`` serialises
+writes for one device, skips writes that would not change anything, and
+keeps a version counter that moves whenever the schedule changes. Entities
+pass the version they last rendered, so an edit made from an outdated view
+is rejected instead of being applied on top of a schedule the user has not
+seen.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field, replace
+
+from homeassistant.core import callback
+
+_LOGGER = logging.getLogger(__name__)
+
+# Matches the range of the battery number entities
+SOC_MIN = 1
+SOC_MAX = 100
+
+_TIME_RE = re.compile(r"^([01]\d|2[0-3]):?([0-5]\d)$")
+
+# Deye item keys and the TouSlot fields they map to
+API_FIELDS = {
+    "time": "time",
+    "soc": "soc",
+    "enableGridCharge": "enable_grid_charge",
+    "enableGeneration": "enable_generation",
+}
+SLOT_KEYS = {slot_field: key for key, slot_field in API_FIELDS.items()}
+
+
+class TouValidationError(ValueError):
+    """Raised when an edited schedule would be rejected by the cloud."""
+
+
+class TouStaleError(ValueError):
+    """Raised when an edit is based on a schedule that has changed since."""
+
+
+def normalize_time(value: str) -> str:
+    """Return a slot time as 'HH:MM', accepting 'HHMM' or 'HH:MM'."""
+    match = _TIME_RE.match(str(value or ""))
+    if not match:
+        raise TouValidationError(f"Invalid TOU time {value!r}, expected HH:MM")
+    return f"{match.group(1)}:{match.group(2)}"
+
+
+@dataclass(frozen=True)
+class TouSlot:
+    time: str
+    soc: int | None = None
+    enable_grid_charge: bool = False
+    enable_generation: bool = False
+    # Any other keys of the Deye item (e.g. power, voltage), passed through unchanged
+    extra: tuple = ()
+    # Deye item keys the slot carries; absent ones are not sent back
+    present: frozenset = field(default=frozenset(API_FIELDS), compare=False)
+
+    @classmethod
+    def from_item(cls, item: dict) -> "TouSlot":
+        soc = item.get("soc")
+        return cls(
+            time=normalize_time(item.get("time")),
+            soc=int(soc) if soc is not None else None,
+            enable_grid_charge=bool(item.get("enableGridCharge")),
+            enable_generation=bool(item.get("enableGeneration")),
+            extra=tuple(sorted((k, v) for k, v in item.items() if k not in API_FIELDS)),
+            present=frozenset(key for key in API_FIELDS if key in item) | {"time"},
+        )
+
+    def to_item(self) -> dict:
+        item = dict(self.extra)
+        for key, slot_field in API_FIELDS.items():
+            if key in self.present:
+                item[key] = getattr(self, slot_field)
+        return item
+
+
+@dataclass(frozen=True)
+class TouSchedule:
+    slots: tuple[TouSlot, ...] = ()
+
+    @classmethod
+    def from_items(cls, items) -> "TouSchedule":
+        return cls(tuple(TouSlot.from_item(item) for item in items or []))
+
+    def to_items(self) -> list[dict]:
+        """Fresh dicts ready to send to ``update_time_of_use``."""
+        return [slot.to_item() for slot in self.slots]
+
+    def with_slot(self, index: int, **changes) -> "TouSchedule":
+        """Return a validated copy with one slot changed."""
+        if not 0 <= index < len(self.slots):
+            raise TouValidationError(f"TOU slot {index + 1} does not exist")
+        if "time" in changes:
+            changes["time"] = normalize_time(changes["time"])
+        slots = list(self.slots)
+        changes["present"] = slots[index].present | {SLOT_KEYS[name] for name in changes}
+        slots[index] = replace(slots[index], **changes)
+        schedule = TouSchedule(tuple(slots))
+        schedule.validate()
+        return schedule
+
+    def validate(self):
+        previous = None
+        for number, slot in enumerate(self.slots, start=1):
+            if slot.soc is not None and not SOC_MIN <= slot.soc <= SOC_MAX:
+                raise TouValidationError(f"TOU slot {number} SoC {slot.soc} is outside {SOC_MIN}-{SOC_MAX}%")
+            if previous is not None and slot.time <= previous:
+                raise TouValidationError(
+                    f"TOU slot {number} starts at {slot.time}, which is not after slot {number - 1} ({previous})"
+                )
+            previous = slot.time
+
+
+class DeyeTouManager:
+    """Owns the TOU schedule of one device and applies edits to it."""
+
+    def __init__(self, api, coordinator):
+        self._api = api
+        self._coordinator = coordinator
+        self._lock = asyncio.Lock()
+        self.schedule = TouSchedule()
+        self.schedule = self._from_coordinator()
+        self.version = 0
+        self._unsub = coordinator.async_add_listener(self._handle_update)
+
+    def _from_coordinator(self) -> TouSchedule:
+        try:
+            return TouSchedule.from_items(self._coordinator.data)
+        except TouValidationError as e:
+            _LOGGER.warning("Ignoring TOU data from the cloud: %s", e)
+            return self.schedule
+
+    @callback
+    def _handle_update(self):
+        if not self._coordinator.data:
+            return
+        schedule = self._from_coordinator()
+        if schedule != self.schedule:
+            self.schedule = schedule
+            self.version += 1
+
+    @callback
+    def async_stop(self):
+        self._unsub()
+
+    async def async_update_slot(self, index: int, expected_version: int | None = None, **changes) -> bool:
+        """Change one slot and write the schedule; returns False if nothing changed.
+
+        With ``expected_version``, the edit is refused with ``TouStaleError``
+        if the schedule has changed since that version.
+        """
+        self.schedule.with_slot(index, **changes)
+
+        async with self._lock:
+            if expected_version is not None and self.version != expected_version:
+                raise TouStaleError(
+                    f"The TOU schedule changed while slot {index + 1} was being edited, "
+                    "check the current values and try again"
+                )
+            current = self.schedule
+            updated = current.with_slot(index, **changes)
+            if updated == current:
+                _LOGGER.debug("TOU slot %s already has %s, skipping write", index + 1, changes)
+                return False
+
+            await self._api.update_time_of_use(updated.to_items())
+            self.schedule = updated
+            self.version += 1
+            # Entities re-render from the written schedule and pick up the new version
+            self._coordinator.async_set_updated_data(updated.to_items())
+
+        await self._coordinator.async_request_refresh()
+        return True
@@ -0,0 +1,186 @@
+"""Record and replay of Deye Cloud API traffic.
+
+The recorder appends one compact JSON line per request/response pair to a
+file, with credentials redacted. The replay session reads such a file and
+answers ``DeyeCloudAPI`` requests from it, so the coordinators and entity
+platforms can be driven from a real site without network access.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import aiohttp
+from yarl import URL
+
+_LOGGER = logging.getLogger(__name__)
+
+REDACTED = "**REDACTED**"
+REDACTED_KEYS = {"appSecret", "email", "password", "accessToken", "refreshToken"}
+
+# Number of exchanges buffered before the recorder writes to disk
+FLUSH_EVERY = 20
+
+
+def redact(value):
+    """Return a copy of a request or response body with credentials masked."""
+    if isinstance(value, dict):
+        return {
+            k: (REDACTED if k in REDACTED_KEYS and v else redact(v))
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    return value
+
+
+def _request_key(path: str, payload) -> str:
+    """Key used to pair a replayed request with a recorded one."""
+    return f"{path} {json.dumps(redact(payload), sort_keys=True, separators=(',', ':'))}"
+
+
+class TrafficRecorder:
+    """Appends request/response pairs with timings to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._buffer: list[str] = []
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def record(self, url: str, payload, status: int, response, elapsed: float):
+        """Queue one exchange; the path is stored without host or query string."""
+        line = json.dumps(
+            {
+                "t": round(time.time(), 3),
+                "d": round(elapsed * 1000, 1),
+                "p": urlsplit(url).path,
+                "q": redact(payload),
+                "s": status,
+                "r": redact(response),
+            },
+            separators=(",", ":"),
+        )
+        self._buffer.append(line)
+        if len(self._buffer) >= FLUSH_EVERY and not (self._flush_task and not self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.async_flush())
+
+    def _write(self, lines: list[str]):
+        try:
+            with open(self._path, "a", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + "\n")
+        except OSError as e:
+            _LOGGER.error("Unable to write API recording to %s: %s", self._path, e)
+
+    async def async_flush(self):
+        """Write any buffered exchanges to disk."""
+        # Serialised so concurrent flushes cannot interleave lines in the file
+        async with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+
+
+def load_recording(path: str) -> list[dict]:
+    """Read a recording file. Blocking, run it in an executor."""
+    exchanges = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                exchanges.append(json.loads(line))
+    return exchanges
+
+
+class _ReplayResponse:
+    """Minimal stand-in for ``aiohttp.ClientResponse``."""
+
+    def __init__(self, url: str, exchange: dict):
+        self._url = url
+        self.status = exchange.get("s", 200)
+        self._body = json.dumps(exchange.get("r")).encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                request_info=aiohttp.RequestInfo(URL(self._url), "POST", {}, URL(self._url)),
+                history=(),
+                status=self.status,
+                message="Replayed error response",
+            )
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self) -> str:
+        return self._body.decode("utf-8")
+
+    async def json(self):
+        return json.loads(self._body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _ReplayRequest:
+    def __init__(self, session: "ReplaySession", url: str, payload):
+        self._session = session
+        self._url = url
+        self._payload = payload
+
+    async def __aenter__(self):
+        exchange = self._session.next_exchange(self._url, self._payload)
+        if self._session.speed > 0:
+            await asyncio.sleep(exchange.get("d", 0) / 1000 / self._session.speed)
+        return _ReplayResponse(self._url, exchange)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class ReplaySession:
+    """Answers ``post`` calls from a recording instead of the network.
+
+    Requests are matched on path and redacted payload, falling back to the
+    path alone. Each match cycles through its recorded responses in order, so
+    a short recording can drive polling indefinitely. ``speed`` scales the
+    recorded latencies: 1.0 is real time, 10.0 is ten times faster and 0
+    answers immediately.
+    """
+
+    def __init__(self, exchanges: list[dict], speed: float = 1.0):
+        self.speed = speed
+        self._by_request: dict[str, deque] = defaultdict(deque)
+        self._by_path: dict[str, deque] = defaultdict(deque)
+        for exchange in exchanges:
+            path = exchange.get("p", "")
+            self._by_request[_request_key(path, exchange.get("q"))].append(exchange)
+            self._by_path[path].append(exchange)
+
+    def next_exchange(self, url: str, payload) -> dict:
+        path = urlsplit(url).path
+        queue = self._by_request.get(_request_key(path, payload)) or self._by_path.get(path)
+        if not queue:
+            _LOGGER.warning("No recorded response for %s, replaying 404", path)
+            return {"p": path, "s": 404, "r": None, "d": 0}
+        exchange = queue[0]
+        queue.rotate(-1)
+        return exchange
+
+    def post(self, url, headers=None, json=None, **kwargs):
+        return _ReplayRequest(self, url, json)
+
+    async def close(self):
+        return
@@ -0,0 +1,120 @@
+"""Microbenchmark for decoding ``/device/latest`` responses.
+
+Compares the previous path (``json.loads`` of the text body, keeping the
+whole ``dataList``) with ``decode.decode_realtime``. By default it runs on
+the redacted ``/device/latest`` responses in ``scripts/fixtures`` (a hybrid
+SUN-12K-SG04LP3, a string SUN-10K-G05 and a micro SUN-M80G3) and on
+synthetic payloads of the same shapes in single and batched responses. Pass
+one or more API recordings (see the README section on recording traffic) to
+benchmark responses captured from your own site instead:
+
+    python scripts/bench_decode.py
+    python scripts/bench_decode.py deye_cloud_<entry_id>_traffic.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import pathlib
+import random
+import timeit
+
+# Load decode.py directly so Home Assistant is not needed to run this
+_DECODE_PATH = pathlib.Path(__file__).resolve().parent.parent / "custom_components" / "deye_cloud" / "decode.py"
+_spec = importlib.util.spec_from_file_location("deye_decode", _DECODE_PATH)
+decode = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(decode)
+
+FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures"
+
+MODELS = {
+    "hybrid": (
+        [("SOC", "%"), ("BMSSOC", "%"), ("BMSCurrent", "A"), ("BMSChargeVoltage", "V"),
+         ("BMSDisChargeVoltage", "V"), ("BatteryPower", "W"), ("BatteryVoltage", "V"),
+         ("TotalSolarPower", "W"), ("TotalGridPower", "W"), ("TotalConsumptionPower", "W"),
+         ("UPSLoadPower", "W"), ("GridFrequency", "Hz"), ("DailyActiveProduction", "kWh"),
+         ("TotalActiveProduction", "kWh"), ("DailyEnergyBuy", "kWh"), ("DailyEnergySell", "kWh"),
+         ("ExternalCT1Power", "W"), ("ExternalCT2Power", "W"), ("ExternalCT3Power", "W"),
+         ("RunningStatus", None), ("FaultStatus", None)]
+        + [(f"{q}PV{i}", u) for i in range(1, 5) for q, u in (("DCVoltage", "V"), ("DCCurrent", "A"), ("DCPower", "W"))]
+        + [(f"{q}L{i}", u) for i in range(1, 4) for q, u in (("ACVoltage", "V"), ("ACCurrent", "A"), ("LoadPower", "W"), ("GridPower", "W"))]
+        + [(f"Temperature{i}", "℃") for i in range(1, 6)]
+    ),
+    "string": (
+        [("TotalDCInputPower", "W"), ("TotalGridPower", "W"), ("GridFrequency", "Hz"),
+         ("DailyActiveProduction", "kWh"), ("TotalActiveProduction", "kWh"), ("RunningStatus", None)]
+        + [(f"{q}PV{i}", u) for i in range(1, 5) for q, u in (("DCVoltage", "V"), ("DCCurrent", "A"), ("DCPower", "W"))]
+        + [(f"{q}L{i}", u) for i in range(1, 4) for q, u in (("ACVoltage", "V"), ("ACCurrent", "A"))]
+    ),
+    "micro": (
+        [("TotalDCInputPower", "W"), ("GridFrequency", "Hz"), ("DailyActiveProduction", "kWh"),
+         ("TotalActiveProduction", "kWh"), ("ACVoltage", "V"), ("RunningStatus", None)]
+        + [(f"{q}PV{i}", u) for i in range(1, 3) for q, u in (("DCVoltage", "V"), ("DCCurrent", "A"))]
+    ),
+}
+
+
+def synthetic_response(model: str, devices: int, rng: random.Random) -> bytes:
+    device_list = []
+    for n in range(devices):
+        device_list.append({
+            "deviceSn": f"{model.upper()}{n:06d}",
+            "deviceId": 100000 + n,
+            "deviceType": "INVERTER",
+            "deviceState": 1,
+            "collectionTime": 1760000000 + n,
+            "dataList": [
+                {"key": key, "value": f"{rng.uniform(0, 5000):.2f}", "unit": unit, "name": key}
+                for key, unit in MODELS[model]
+            ],
+        })
+    body = {"code": "1000000", "msg": "success", "success": True, "requestId": "bench", "deviceDataList": device_list}
+    return json.dumps(body).encode("utf-8")
+
+
+def recorded_responses(paths: list[str]) -> list[tuple[str, bytes]]:
+    payloads = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for n, line in enumerate(fh):
+                if not line.strip():
+                    continue
+                exchange = json.loads(line)
+                if exchange.get("p", "").endswith("/device/latest") and exchange.get("r"):
+                    payloads.append((f"{pathlib.Path(path).name}#{n}", json.dumps(exchange["r"]).encode("utf-8")))
+    return payloads
+
+
+def baseline(raw: bytes):
+    result = json.loads(raw.decode("utf-8"))
+    return result.get("deviceDataList", [{}])[0].get("dataList", [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="*", help="API recordings to take /device/latest responses from")
+    parser.add_argument("-n", "--number", type=int, default=2000, help="decodes per timing run")
+    args = parser.parse_args()
+
+    if args.recordings:
+        payloads = recorded_responses(args.recordings)
+    else:
+        rng = random.Random(0)
+        payloads = recorded_responses(sorted(str(path) for path in FIXTURES.glob("*.jsonl")))
+        payloads += [
+            (f"{model} x{devices}", synthetic_response(model, devices, rng))
+            for model in MODELS
+            for devices in (1, 10)
+        ]
+
+    print(f"JSON backend: {decode.JSON_BACKEND}")
+    print(f"{'payload':<32}{'bytes':>9}{'baseline µs':>14}{'decode µs':>12}{'speedup':>9}")
+    for name, raw in payloads:
+        old = min(timeit.repeat(lambda: baseline(raw), number=args.number, repeat=5)) / args.number
+        new = min(timeit.repeat(lambda: decode.decode_realtime(raw), number=args.number, repeat=5)) / args.number
+        print(f"{name:<32}{len(raw):>9}{old * 1e6:>14.1f}{new * 1e6:>12.1f}{old / new:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()